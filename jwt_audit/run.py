@@ -12,6 +12,14 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger('jwt-audit')
 
+# 必要依赖：发行包名（pip安装名）-> 导入名
+REQUIRED_PACKAGES = {
+    'click': 'click',
+    'pyjwt': 'jwt',
+    'cryptography': 'cryptography',
+    'rich': 'rich',
+}
+
 def setup_environment():
     """设置Python环境，确保正确导入"""
     
@@ -87,12 +95,18 @@ def import_and_run():
 
 def check_dependencies():
     """检查必要的依赖是否安装"""
-    required_packages = ['click', 'pyjwt', 'cryptography', 'rich']
+    # 同一解释器之前已检查通过时（如被包装脚本反复启动）跳过重复导入；
+    # 标记记录解释器路径，换了环境（虚拟环境/Python版本）仍会重新检查。
+    # 设置 JWT_AUDIT_FORCE_RECHECK=1 可强制重新检查
+    if (os.environ.get('JWT_AUDIT_FORCE_RECHECK') != '1'
+            and os.environ.get('JWT_AUDIT_DEPS_OK') == sys.executable):
+        return True
+    
     missing = []
     
-    for package in required_packages:
+    for package, module in REQUIRED_PACKAGES.items():
         try:
-            __import__(package)
+            __import__(module)
             logger.debug(f"✅ {package} 已安装")
         except ImportError:
             missing.append(package)
@@ -102,6 +116,7 @@ def check_dependencies():
         logger.info("💡 运行: pip install -r requirements.txt")
         return False
     
+    os.environ['JWT_AUDIT_DEPS_OK'] = sys.executable
     return True
 
 def main():
@@ -0,0 +1,79 @@
+"""
+JSON编解码工具
+审计引擎与检测器共用，避免各自维护一套orjson/ujson/json回退逻辑
+"""
+
+import json
+import math
+
+# JWT解码始终使用标准库json：与PyJWT等服务端的解析行为保持一致（接受NaN、孤立代理项、
+# 任意精度整数），避免更严格的解析器让服务端可接受的恶意令牌绕过检测
+loads = json.loads
+
+# 各后端输出格式保持一致：缩进模式与orjson/ujson相同，单行模式使用紧凑分隔符，
+# 同一个JSON Lines流中回退到标准库的行与其它行格式相同
+def _stdlib_dumps(o) -> str:
+    return json.dumps(o, indent=2, ensure_ascii=False)
+
+def _stdlib_dumps_line(o) -> str:
+    return json.dumps(o, ensure_ascii=False, separators=(',', ':'))
+
+def _has_non_finite(o) -> bool:
+    """是否包含NaN/Infinity（报告需如实反映令牌内容，orjson会将其输出为null）"""
+    if isinstance(o, float):
+        return not math.isfinite(o)
+    if isinstance(o, dict):
+        return any(_has_non_finite(v) for v in o.values())
+    if isinstance(o, (list, tuple)):
+        return any(_has_non_finite(v) for v in o)
+    return False
+
+def compact_dumps(o) -> bytes:
+    """紧凑序列化为bytes（POC需忠实还原NaN、超过64位的整数等，因此使用标准库json）"""
+    return json.dumps(o, separators=(',', ':')).encode()
+
+# 报告序列化：优先使用orjson（C/Rust实现），其次ujson，都未安装时使用标准库json
+try:
+    import orjson
+
+    def dumps(o) -> str:
+        """缩进格式输出"""
+        if _has_non_finite(o):
+            return _stdlib_dumps(o)
+        try:
+            return orjson.dumps(o, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:  # orjson不支持超过64位的整数等，回退到标准库
+            return _stdlib_dumps(o)
+
+    def dumps_line(o) -> str:
+        """单行输出（JSON Lines）"""
+        if _has_non_finite(o):
+            return _stdlib_dumps_line(o)
+        try:
+            return orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            return _stdlib_dumps_line(o)
+except ImportError:
+    try:
+        import ujson  # 与标准库json接口兼容
+
+        # 5.5之前的ujson遇到超过64位的整数会抛错甚至输出残缺的JSON，视为不可用
+        if tuple(int(p) for p in ujson.__version__.split('.')[:2]) < (5, 5):
+            raise ImportError(f"ujson {ujson.__version__} 过旧，需要 >= 5.5")
+
+        def dumps(o) -> str:
+            """缩进格式输出"""
+            try:
+                return ujson.dumps(o, indent=2, ensure_ascii=False, escape_forward_slashes=False)
+            except (TypeError, OverflowError):
+                return _stdlib_dumps(o)
+
+        def dumps_line(o) -> str:
+            """单行输出（JSON Lines）"""
+            try:
+                return ujson.dumps(o, ensure_ascii=False, escape_forward_slashes=False)
+            except (TypeError, OverflowError):
+                return _stdlib_dumps_line(o)
+    except ImportError:
+        dumps = _stdlib_dumps
+        dumps_line = _stdlib_dumps_line
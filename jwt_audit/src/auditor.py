@@ -3,15 +3,51 @@ JWT安全审计引擎主模块
 核心功能：JWT解码、漏洞检测、报告生成
 """
 
-import base64
-import json
+import binascii
 import os
 import sys
-from typing import Dict, Tuple, List
+from collections import Counter
+from typing import Dict, Tuple, List, Optional
 
 # 添加当前目录到路径，以便导入detectors
 sys.path.append(os.path.dirname(__file__))
 
+if __package__:
+    from ._jsoncodec import loads as _loads, dumps as _dumps, dumps_line as _dumps_line
+    from .detectors import DETECTORS
+    from .detectors.none_algorithm import generate_exploit_poc
+else:
+    from _jsoncodec import loads as _loads, dumps as _dumps, dumps_line as _dumps_line
+    from detectors import DETECTORS
+    from detectors.none_algorithm import generate_exploit_poc
+
+# Base64Url -> Base64 字符映射表，以及按 len % 4 索引的填充
+_B64URL_TRANS = bytes.maketrans(b'-_', b'+/')
+_PAD = (b'', b'===', b'==', b'=')
+
+# 各严重级别漏洞的扣分
+_SEV_SCORE = {'CRITICAL': 40, 'HIGH': 30, 'MEDIUM': 20, 'LOW': 10}
+
+def base64url_decode(data: str) -> bytes:
+    """Base64Url解码（一次translate完成字符替换，由binascii的C实现解码）"""
+    b = data.encode('ascii').translate(_B64URL_TRANS) + _PAD[len(data) & 3]
+    return binascii.a2b_base64(b)
+
+# JWT结构错误提示；审计结果中的错误与decode_jwt抛出的异常信息保持一致
+_JWT_STRUCTURE_ERROR = "JWT必须有header.payload.signature三部分"
+_JWT_STRUCTURE_AUDIT_ERROR = f"JWT解码失败: {_JWT_STRUCTURE_ERROR}"
+
+def _split_jwt(token: str) -> Tuple[str, str, str]:
+    """将JWT切分为header、payload、signature三段（格式无效时抛出ValueError）"""
+    # rsplit限定最多切分两次：多余的'.'会留在header部分，部分不足时解包失败
+    try:
+        header_b64, payload_b64, signature = token.rsplit('.', 2)
+        if '.' in header_b64:
+            raise ValueError
+    except ValueError:
+        raise ValueError(_JWT_STRUCTURE_ERROR)
+    return header_b64, payload_b64, signature
+
 def decode_jwt(token: str) -> Tuple[Dict, Dict, str]:
     """
     解码JWT令牌
@@ -26,66 +62,78 @@ def decode_jwt(token: str) -> Tuple[Dict, Dict, str]:
         ValueError: JWT格式无效时抛出
     """
     try:
-        parts = token.split('.')
-        if len(parts) != 3:
-            raise ValueError("JWT必须有header.payload.signature三部分")
+        header_b64, payload_b64, signature = _split_jwt(token)
+        
+        # 解码头部和载荷（json.loads直接接受bytes，无需先decode）
+        header = _loads(base64url_decode(header_b64))
+        payload = _loads(base64url_decode(payload_b64))
         
-        # Base64Url解码函数
-        def base64url_decode(data: str) -> bytes:
-            # 添加必要的填充
-            padding = 4 - len(data) % 4
-            if padding != 4:
-                data += "=" * padding
-            # Base64Url -> Base64
-            data = data.replace('-', '+').replace('_', '/')
-            return base64.b64decode(data)
+        return header, payload, signature
+    
+    except Exception as e:
+        raise ValueError(f"JWT解码失败: {e}")
+
+def decode_jwt_header_only(token: str) -> Tuple[Dict, str]:
+    """
+    仅解码JWT头部，不解析载荷
+    
+    Args:
+        token: JWT字符串
         
-        # 解码头部和载荷
-        header = json.loads(base64url_decode(parts[0]).decode('utf-8'))
-        payload = json.loads(base64url_decode(parts[1]).decode('utf-8'))
+    Returns:
+        (header字典, 签名字符串)
         
-        return header, payload, parts[2]
+    Raises:
+        ValueError: JWT格式无效时抛出
+    """
+    try:
+        header_b64, _, signature = _split_jwt(token)
+        return _loads(base64url_decode(header_b64)), signature
     
     except Exception as e:
         raise ValueError(f"JWT解码失败: {e}")
 
+def _detector_needs_payload(detector) -> bool:
+    """根据检测器所在模块的REQUIRES声明判断是否需要载荷（未声明时视为需要）"""
+    module = sys.modules.get(getattr(detector, '__module__', None))
+    return 'payload' in getattr(module, 'REQUIRES', {'payload'})
+
 class JWTAuditor:
     """JWT安全审计器"""
     
     def __init__(self):
-        self.detectors = []
-        self._load_detectors()
+        # 默认使用静态注册表；插件开发时可设置 JWT_AUDIT_PLUGINS=1 扫描detectors目录
+        if os.environ.get('JWT_AUDIT_PLUGINS') == '1':
+            self.detectors = []
+            self._load_detectors()
+        else:
+            self.detectors = list(DETECTORS)
+        # 所有检测器都不读取载荷时，审计时跳过载荷解析
+        self._needs_payload = any(_detector_needs_payload(d) for d in self.detectors)
     
     def _load_detectors(self):
-        """动态加载所有检测器"""
+        """从detectors目录动态加载所有检测器（插件模式）"""
         import importlib
+        import pkgutil
     
         detectors_dir = os.path.join(os.path.dirname(__file__), 'detectors')
+        modules = sys.modules  # 只读取一次，已导入的检测器直接复用
+        # 被作为包导入时使用包内路径，作为主模块/顶层模块运行时直接导入detectors
+        package = f'{__package__}.detectors' if __package__ else 'detectors'
     
-        if os.path.exists(detectors_dir):
-            for filename in os.listdir(detectors_dir):
-                if filename.endswith('.py') and filename != '__init__.py':
-                    module_name = filename[:-3]  # 去掉.py后缀
-                    try:
-                        # 使用相对导入
-                        if '.' in __name__:
-                            # 如果auditor是被导入的，使用相对路径
-                            base_package = __name__.rsplit('.', 1)[0]
-                            full_module_name = f'{base_package}.detectors.{module_name}'
-                        else:
-                            # 如果auditor是主模块
-                            full_module_name = f'detectors.{module_name}'
-                    
-                        # 使用importlib动态导入
-                        module = importlib.import_module(full_module_name)
-                    
-                        if hasattr(module, 'detect'):
-                            self.detectors.append(module.detect)
-                            print(f"✅ 加载检测器: {module_name}")
-                    except ImportError as e:
-                        print(f"❌ 加载检测器 {module_name} 失败: {e}")
-                    except AttributeError as e:
-                        print(f"❌ 检测器 {module_name} 缺少detect函数: {e}")
+        for info in pkgutil.iter_modules([detectors_dir]):
+            module_name = info.name
+            full_module_name = f'{package}.{module_name}'
+            try:
+                # 优先复用已导入的模块，否则使用importlib动态导入
+                module = modules.get(full_module_name) or importlib.import_module(full_module_name)
+            
+                detect = getattr(module, 'detect', None)
+                if detect:
+                    self.detectors.append(detect)
+                    print(f"✅ 加载检测器: {module_name}")
+            except ImportError as e:
+                print(f"❌ 加载检测器 {module_name} 失败: {e}")
     
     def audit(self, jwt_token: str) -> Dict:
         """
@@ -98,53 +146,55 @@ class JWTAuditor:
             完整的审计结果字典
         """
         try:
-            # 1. 解码JWT
-            header, payload, signature = decode_jwt(jwt_token)
+            # 快速拒绝结构明显不对的令牌，不进入解码和异常处理流程
+            if jwt_token.count('.') != 2:
+                return {
+                    'success': False,
+                    'error': _JWT_STRUCTURE_AUDIT_ERROR,
+                    'jwt_token': jwt_token
+                }
+            
+            # 1. 解码JWT（无检测器需要载荷时只解码头部，payload为None）
+            if self._needs_payload:
+                header, payload, signature = decode_jwt(jwt_token)
+            else:
+                header, signature = decode_jwt_header_only(jwt_token)
+                payload = None
             
             # 2. 运行所有检测器
             findings = []
+            add_finding = findings.append  # 循环内避免重复的属性查找
             for detector in self.detectors:
                 try:
                     result = detector(header, payload, signature)
                     if result:  # 只添加有结果的检测
-                        findings.append(result)
+                        add_finding(result)
                 except Exception as e:
                     print(f"⚠️ 检测器执行失败: {e}")
                     continue
             
             # 3. 计算安全评分和汇总
-            security_score = 100
-            critical_vulns = 0
-            high_vulns = 0
-            
-            for finding in findings:
-                if finding.get('vulnerable', False):
-                    severity = finding.get('severity', 'LOW')
-                    if severity == 'CRITICAL':
-                        security_score -= 40
-                        critical_vulns += 1
-                    elif severity == 'HIGH':
-                        security_score -= 30
-                        high_vulns += 1
-                    elif severity == 'MEDIUM':
-                        security_score -= 20
-                    elif severity == 'LOW':
-                        security_score -= 10
+            # 每个发现只读取一次vulnerable/severity
+            vuln_severities = [f.get('severity', 'LOW') for f in findings if f.get('vulnerable')]
+            sev = Counter(vuln_severities)
+            security_score = max(0, 100 - sum(_SEV_SCORE.get(s, 0) * n for s, n in sev.items()))  # 确保不低于0
+            critical_vulns, high_vulns = sev.get('CRITICAL', 0), sev.get('HIGH', 0)
             
-            security_score = max(0, security_score)  # 确保不低于0
+            jwt_short = jwt_token[:30] + '...' if len(jwt_token) > 30 else jwt_token
+            total_checks = len(findings)
             
             return {
                 'success': True,
                 'jwt_token': jwt_token,
-                'jwt_short': jwt_token[:30] + '...' if len(jwt_token) > 30 else jwt_token,
+                'jwt_short': jwt_short,
                 'header': header,
                 'payload': payload,
                 'signature_length': len(signature),
                 'findings': findings,
                 'security_score': security_score,
                 'summary': {
-                    'total_checks': len(findings),
-                    'vulnerabilities_found': sum(1 for f in findings if f.get('vulnerable', False)),
+                    'total_checks': total_checks,
+                    'vulnerabilities_found': len(vuln_severities),
                     'critical_vulnerabilities': critical_vulns,
                     'high_vulnerabilities': high_vulns,
                     'status': 'SAFE' if security_score >= 80 else 'UNSAFE'
@@ -158,6 +208,50 @@ class JWTAuditor:
                 'jwt_token': jwt_token
             }
 
+def get_exploit_poc(finding: Dict) -> Optional[str]:
+    """获取发现中的攻击POC（检测器延迟生成的POC在此时才计算）"""
+    poc = finding.get('exploit_poc')
+    if poc is None and '_exploit_poc_args' in finding:
+        poc = generate_exploit_poc(*finding['_exploit_poc_args'])
+    return poc
+
+def materialize_audit_result(audit_result: Dict) -> Dict:
+    """生成用于输出的审计结果：补全延迟生成的exploit_poc，去掉内部字段"""
+    findings = audit_result.get('findings')
+    if not findings or not any('_exploit_poc_args' in f for f in findings):
+        return audit_result
+    
+    materialized = []
+    for finding in findings:
+        if '_exploit_poc_args' in finding:
+            poc = get_exploit_poc(finding)
+            finding = {k: v for k, v in finding.items() if k != '_exploit_poc_args'}
+            finding['exploit_poc'] = poc
+        materialized.append(finding)
+    return {**audit_result, 'findings': materialized}
+
+# 模块级审计器单例，避免重复扫描和导入检测器。
+# 不按detectors目录的mtime失效：批量审计时每个令牌都会调用get_auditor，逐次stat得不偿失；
+# 修改检测器后重启进程即可生效
+_AUDITOR_SINGLETON = None
+
+def get_auditor() -> JWTAuditor:
+    """获取共享的JWTAuditor实例（首次调用时创建）"""
+    global _AUDITOR_SINGLETON
+    if _AUDITOR_SINGLETON is None:
+        _AUDITOR_SINGLETON = JWTAuditor()
+    return _AUDITOR_SINGLETON
+
+# 报告中使用的严重级别颜色和漏洞状态图标（按int(vulnerable)索引）
+_SEVERITY_COLOR = {
+    'CRITICAL': '🔴',
+    'HIGH': '🟠',
+    'MEDIUM': '🟡',
+    'LOW': '🟢',
+    'INFO': '⚪'
+}
+_VULN_ICON = ('✅', '❌')
+
 def print_audit_report(audit_result: Dict):
     """打印格式化的审计报告"""
     if not audit_result['success']:
@@ -166,58 +260,55 @@ def print_audit_report(audit_result: Dict):
     
     data = audit_result
     summary = data['summary']
+    lines = []  # 先收集所有行，最后一次性输出
     
-    print("\n" + "="*60)
-    print("🔐 JWT SECURITY AUDIT REPORT")
-    print("="*60)
+    lines.append("\n" + "="*60)
+    lines.append("🔐 JWT SECURITY AUDIT REPORT")
+    lines.append("="*60)
     
     # 基本信息
-    print(f"\n📄 JWT: {data['jwt_short']}")
-    print(f"🔢 算法: {data['header'].get('alg', '未指定')}")
-    print(f"📊 安全评分: {data['security_score']}/100")
+    lines.append(f"\n📄 JWT: {data['jwt_short']}")
+    lines.append(f"🔢 算法: {data['header'].get('alg', '未指定')}")
+    lines.append(f"📊 安全评分: {data['security_score']}/100")
     
     # 安全状态
     status_icon = "🟢" if summary['status'] == 'SAFE' else "🔴"
-    print(f"📈 状态: {status_icon} {summary['status']}")
+    lines.append(f"📈 状态: {status_icon} {summary['status']}")
     
     # 统计信息
-    print(f"\n📋 检测统计:")
-    print(f"   检查总数: {summary['total_checks']}")
-    print(f"   发现漏洞: {summary['vulnerabilities_found']}")
-    print(f"   严重漏洞: {summary['critical_vulnerabilities']}")
-    print(f"   高危漏洞: {summary['high_vulnerabilities']}")
+    lines.append(f"\n📋 检测统计:")
+    lines.append(f"   检查总数: {summary['total_checks']}")
+    lines.append(f"   发现漏洞: {summary['vulnerabilities_found']}")
+    lines.append(f"   严重漏洞: {summary['critical_vulnerabilities']}")
+    lines.append(f"   高危漏洞: {summary['high_vulnerabilities']}")
     
     # 详细发现
     if data['findings']:
-        print(f"\n🔍 详细检测结果:")
-        print("-" * 40)
+        lines.append(f"\n🔍 详细检测结果:")
+        lines.append("-" * 40)
         
         for i, finding in enumerate(data['findings'], 1):
-            vulnerable = finding.get('vulnerable', False)
+            vulnerable = bool(finding.get('vulnerable', False))
             severity = finding.get('severity', 'INFO')
             
             # 选择图标和颜色
-            icon = "❌" if vulnerable else "✅"
-            color = {
-                'CRITICAL': '🔴',
-                'HIGH': '🟠', 
-                'MEDIUM': '🟡',
-                'LOW': '🟢',
-                'INFO': '⚪'
-            }.get(severity, '⚪')
+            icon = _VULN_ICON[vulnerable]
+            color = _SEVERITY_COLOR.get(severity, '⚪')
             
-            print(f"{i}. {icon} {color} [{severity}] {finding['detector']}")
-            print(f"   {finding['description']}")
+            lines.append(f"{i}. {icon} {color} [{severity}] {finding['detector']}")
+            lines.append(f"   {finding['description']}")
             
             if vulnerable:
                 if finding.get('recommendation'):
-                    print(f"   💡 建议: {finding['recommendation']}")
-                if finding.get('exploit_poc'):
-                    print(f"   💥 POC: {finding['exploit_poc'][:80]}...")
+                    lines.append(f"   💡 建议: {finding['recommendation']}")
+                exploit_poc = get_exploit_poc(finding)
+                if exploit_poc:
+                    lines.append(f"   💥 POC: {exploit_poc[:80]}...")
             
-            print()  # 空行分隔
+            lines.append("")  # 空行分隔
     
-    print("="*60)
+    lines.append("="*60)
+    sys.stdout.write("\n".join(lines) + "\n")
 
 # 测试函数
 def test_auditor():
@@ -228,7 +319,7 @@ def test_auditor():
         "无效JWT": "invalid.jwt.token"
     }
     
-    auditor = JWTAuditor()
+    auditor = get_auditor()
     
     for name, token in test_jwts.items():
         print(f"\n🧪 测试: {name}")
@@ -7,6 +7,15 @@ import click
 import json
 import sys
 import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+# 批量审计时每个任务块的最大令牌数；同时处理中的块数为工作进程数的2倍，
+# 因此内存中最多保留约 2 * 进程数 * _MAX_CHUNKSIZE 个令牌/结果
+_MAX_CHUNKSIZE = 256
 
 # ========== 健壮的导入处理 ==========
 def import_auditor_modules():
@@ -15,8 +24,10 @@ def import_auditor_modules():
     
     # 方法1: 相对导入（作为模块运行时）
     try:
-        from .auditor import JWTAuditor, print_audit_report, decode_jwt
-        return JWTAuditor, print_audit_report, decode_jwt, None
+        from .auditor import (JWTAuditor, get_auditor, print_audit_report, decode_jwt,
+                              _dumps, _dumps_line, materialize_audit_result)
+        return (JWTAuditor, get_auditor, print_audit_report, decode_jwt, _dumps, _dumps_line,
+                materialize_audit_result, None)
     except ImportError as e:
         import_error = e
     
@@ -30,8 +41,10 @@ def import_auditor_modules():
         if project_root not in sys.path:
             sys.path.insert(0, project_root)
         
-        from jwt_audit.src.auditor import JWTAuditor, print_audit_report, decode_jwt
-        return JWTAuditor, print_audit_report, decode_jwt, None
+        from jwt_audit.src.auditor import (JWTAuditor, get_auditor, print_audit_report, decode_jwt,
+                                           _dumps, _dumps_line, materialize_audit_result)
+        return (JWTAuditor, get_auditor, print_audit_report, decode_jwt, _dumps, _dumps_line,
+                materialize_audit_result, None)
         
     except ImportError as e:
         import_error = e
@@ -43,14 +56,17 @@ def import_auditor_modules():
         if src_dir not in sys.path:
             sys.path.insert(0, src_dir)
         
-        from auditor import JWTAuditor, print_audit_report, decode_jwt
-        return JWTAuditor, print_audit_report, decode_jwt, None
+        from auditor import (JWTAuditor, get_auditor, print_audit_report, decode_jwt,
+                             _dumps, _dumps_line, materialize_audit_result)
+        return (JWTAuditor, get_auditor, print_audit_report, decode_jwt, _dumps, _dumps_line,
+                materialize_audit_result, None)
         
     except ImportError as e:
-        return None, None, None, f"所有导入方式都失败: {import_error}"
+        return None, None, None, None, None, None, None, f"所有导入方式都失败: {import_error}"
 
 # 执行导入
-JWTAuditor, print_audit_report, decode_jwt, import_error = import_auditor_modules()
+(JWTAuditor, get_auditor, print_audit_report, decode_jwt, _dumps, _dumps_line,
+ materialize_audit_result, import_error) = import_auditor_modules()
 
 if import_error:
     # 如果导入失败，创建占位函数
@@ -66,9 +82,78 @@ if import_error:
             }
     
     JWTAuditor = DummyAuditor
+    get_auditor = DummyAuditor
     print_audit_report = lambda x: print(f"❌ 审计报告不可用: {import_error}")
     decode_jwt = lambda x: ({}, {}, '')
+    _dumps = lambda o: json.dumps(o, indent=2, ensure_ascii=False)
+    _dumps_line = lambda o: json.dumps(o, ensure_ascii=False)
+    materialize_audit_result = lambda x: x
+
+def _iter_tokens(path):
+    """逐行读取令牌文件，跳过空行和#注释行"""
+    with open(path, 'r', encoding='utf-8', buffering=1 << 20) as f:
+        for line in f:
+            s = line.strip()
+            if s and not s.startswith('#'):
+                yield s
+
+def _count_tokens(path):
+    """统计令牌行数（用于进度条长度，与_iter_tokens使用相同的解码和过滤规则）"""
+    return sum(1 for _ in _iter_tokens(path))
+
+def _audit_one(token):
+    """审计单个令牌（供进程池调用，每个工作进程只创建一次审计器）"""
+    return get_auditor().audit(token)
+
+def _audit_chunk(tokens, materialize=False):
+    """审计一块令牌（进程池任务单元，materialize为True时在工作进程中生成POC）"""
+    if materialize:
+        return [materialize_audit_result(_audit_one(token)) for token in tokens]
+    return [_audit_one(token) for token in tokens]
+
+def _use_process_pool(workers, token_count, chunksize):
+    """判断批量审计是否值得/能够使用进程池"""
+    # 单核或令牌不足一块时，进程池只有额外开销
+    if workers <= 1 or token_count <= chunksize:
+        return False
+    # 通过run.py的exec方式运行时，函数位于伪造的__main__命名空间中，无法被子进程按名称导入
+    try:
+        pickle.dumps(_audit_chunk)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+def _iter_audit_results(executor, tokens, chunksize, max_pending, materialize=False):
+    """
+    按输入顺序产出审计结果
     
+    与Executor.map不同，令牌按需从迭代器读取：同时最多只有max_pending个块在处理中。
+    executor为None时在当前进程中逐块审计；materialize透传给_audit_chunk
+    """
+    tokens = iter(tokens)
+    
+    if executor is None:
+        while True:
+            chunk = list(islice(tokens, chunksize))
+            if not chunk:
+                return
+            yield from _audit_chunk(chunk, materialize)
+    
+    pending = deque()
+    
+    def submit_next():
+        chunk = list(islice(tokens, chunksize))
+        if chunk:
+            pending.append(executor.submit(_audit_chunk, chunk, materialize))
+    
+    for _ in range(max_pending):
+        submit_next()
+    
+    while pending:
+        results = pending.popleft().result()
+        submit_next()
+        yield from results
+
     
 @click.group()
 def cli():
@@ -81,11 +166,11 @@ def cli():
 @click.option('--output', '-o', type=click.Path(), help='输出到文件')
 def audit(token, json_output, output):
     """审计单个JWT令牌"""
-    auditor = JWTAuditor()
+    auditor = get_auditor()
     result = auditor.audit(token)
     
     if json_output:
-        output_data = json.dumps(result, indent=2, ensure_ascii=False)
+        output_data = _dumps(materialize_audit_result(result))
     else:
         output_data = result
     
@@ -107,41 +192,62 @@ def audit(token, json_output, output):
 
 @cli.command()
 @click.argument('file', type=click.Path(exists=True))
-@click.option('--format', '-f', type=click.Choice(['json', 'text']), default='text', help='输出格式')
+@click.option('--format', '-f', type=click.Choice(['json', 'jsonl', 'text']), default='text',
+              help='输出格式（jsonl为每行一个结果，便于增量解析）')
 def batch(file, format):
     """批量审计文件中的JWT令牌（每行一个）"""
     try:
-        with open(file, 'r', encoding='utf-8') as f:
-            tokens = [line.strip() for line in f if line.strip()]
+        token_count = _count_tokens(file)
         
-        if not tokens:
+        if not token_count:
             click.echo("❌ 文件为空或没有有效的JWT令牌")
             return
         
-        auditor = JWTAuditor()
-        results = []
+        # 各令牌审计相互独立，逐行读取后分块交给进程池并行处理（不适用时在当前进程中处理）
+        workers = os.cpu_count() or 1
+        chunksize = max(1, min(_MAX_CHUNKSIZE, token_count // (workers * 4)))
+        use_pool = _use_process_pool(workers, token_count, chunksize)
+        streaming = format in ('json', 'jsonl')
         
-        with click.progressbar(tokens, label='审计进度') as bar:
-            for token in bar:
-                result = auditor.audit(token)
-                results.append(result)
+        # 边审计边输出/统计，不在内存中保留全部结果
+        total = successful = vulnerabilities = 0
+        vulnerable_tokens = []  # 文本模式下仅保留有漏洞令牌的简要信息
         
-        # 汇总统计
-        total = len(results)
-        successful = sum(1 for r in results if r.get('success', False))
-        vulnerabilities = sum(1 for r in results 
-                            if r.get('success', False) and 
-                            r.get('summary', {}).get('vulnerabilities_found', 0) > 0)
+        with (ProcessPoolExecutor(max_workers=workers) if use_pool else nullcontext()) as ex:
+            # JSON输出需要POC，在工作进程中生成；文本模式不输出POC，保持延迟
+            results = _iter_audit_results(ex, _iter_tokens(file), chunksize,
+                                          max_pending=workers * 2, materialize=streaming)
+            # 流式输出JSON时进度条写到stderr，避免混入stdout中的JSON
+            with click.progressbar(results, length=token_count, label='审计进度',
+                                   file=sys.stderr if streaming else None) as bar:
+                if format == 'json':
+                    click.echo('{"results": [')
+                
+                for result in bar:
+                    if format == 'json':
+                        click.echo((',' if total else '') + _dumps(result))
+                    elif format == 'jsonl':
+                        click.echo(_dumps_line(result))
+                    
+                    # 汇总统计
+                    total += 1
+                    if result.get('success', False):
+                        successful += 1
+                        if result.get('summary', {}).get('vulnerabilities_found', 0) > 0:
+                            vulnerabilities += 1
+                            if not streaming:
+                                vulnerable_tokens.append((result['jwt_short'], result['security_score']))
+        
+        batch_summary = {
+            'total_tokens': total,
+            'successful_audits': successful,
+            'tokens_with_vulnerabilities': vulnerabilities
+        }
         
         if format == 'json':
-            click.echo(json.dumps({
-                'batch_summary': {
-                    'total_tokens': total,
-                    'successful_audits': successful,
-                    'tokens_with_vulnerabilities': vulnerabilities
-                },
-                'results': results
-            }, indent=2, ensure_ascii=False))
+            click.echo('], "batch_summary": ' + _dumps(batch_summary) + '}')
+        elif format == 'jsonl':
+            click.echo(_dumps_line({'batch_summary': batch_summary}))
         else:
             click.echo(f"\n📊 批量审计完成!")
             click.echo(f"   总计令牌: {total}")
@@ -149,22 +255,22 @@ def batch(file, format):
             click.echo(f"   存在漏洞: {vulnerabilities}")
             
             # 显示有漏洞的令牌
-            vulnerable_tokens = [r for r in results 
-                               if r.get('success', False) and 
-                               r.get('summary', {}).get('vulnerabilities_found', 0) > 0]
-            
             if vulnerable_tokens:
                 click.echo(f"\n🔴 存在漏洞的令牌:")
-                for result in vulnerable_tokens:
-                    click.echo(f"   {result['jwt_short']} - 评分: {result['security_score']}/100")
+                for jwt_short, security_score in vulnerable_tokens:
+                    click.echo(f"   {jwt_short} - 评分: {security_score}/100")
     
     except Exception as e:
+        if format in ('json', 'jsonl'):
+            # stdout中可能已输出部分JSON，错误写到stderr并以非零状态退出，便于管道下游识别
+            click.echo(f"❌ 批量审计失败: {e}", err=True)
+            sys.exit(1)
         click.echo(f"❌ 批量审计失败: {e}")
 
 @cli.command()
 def detectors():
     """列出所有可用的检测器"""
-    auditor = JWTAuditor()
+    auditor = get_auditor()
     click.echo("🔍 可用的漏洞检测器:")
     click.echo("=" * 40)
     
@@ -185,9 +291,9 @@ def decode(token):
         header, payload, signature = decode_jwt(token)
         click.echo("✅ JWT解码成功!")
         click.echo("\n📄 头部:")
-        click.echo(json.dumps(header, indent=2, ensure_ascii=False))
+        click.echo(_dumps(header))
         click.echo("\n📋 载荷:")
-        click.echo(json.dumps(payload, indent=2, ensure_ascii=False))
+        click.echo(_dumps(payload))
         click.echo(f"\n🔏 签名长度: {len(signature)} 字符")
         click.echo(f"签名: {signature[:50]}..." if len(signature) > 50 else signature)
     except Exception as e:
@@ -0,0 +1,9 @@
+"""
+内置检测器注册表
+新增内置检测器时在此登记；第三方插件可通过 JWT_AUDIT_PLUGINS=1 启用目录扫描加载
+"""
+
+from .none_algorithm import detect as _none
+from .weak_key import detect as _weak
+
+DETECTORS = (_none, _weak)
@@ -4,7 +4,27 @@ None算法漏洞检测器
 CWE-303: 使用密码学弱点的认证绕过
 """
 
-def detect(header: dict, payload: dict, signature: str) -> dict:
+import binascii
+from typing import Optional
+
+try:
+    from .._jsoncodec import compact_dumps
+except ImportError:
+    # detectors作为顶层包导入，或直接运行本文件时，从src目录导入
+    import os
+    import sys
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if src_dir not in sys.path:
+        sys.path.append(src_dir)
+    from _jsoncodec import compact_dumps
+
+# 检测读取头部的alg字段；生成POC时需要原始载荷
+REQUIRES = frozenset({'alg', 'payload'})
+
+# Base64 -> Base64Url 字符映射表
+_B64_TO_URL_TRANS = bytes.maketrans(b'+/', b'-_')
+
+def detect(header: dict, payload: Optional[dict], signature: str) -> dict:
     """
     检测JWT是否使用危险的'none'算法
     
@@ -25,7 +45,8 @@ def detect(header: dict, payload: dict, signature: str) -> dict:
             'detector': 'NoneAlgorithm',
             'description': 'JWT使用"none"算法，攻击者可完全绕过签名验证',
             'recommendation': '立即停止使用none算法，改用HS256/RS256等安全算法',
-            'exploit_poc': _generate_exploit_poc(header, payload),
+            # 只保存生成POC所需的参数，由报告/输出时通过get_exploit_poc延迟生成
+            '_exploit_poc_args': (header, payload),
             'cvss_score': 9.1,
             'cwe': 'CWE-303'
         }
@@ -38,20 +59,16 @@ def detect(header: dict, payload: dict, signature: str) -> dict:
         'cvss_score': 0.0
     }
 
-def _generate_exploit_poc(header: dict, payload: dict) -> str:
+def generate_exploit_poc(header: dict, payload: dict) -> str:
     """生成攻击验证POC"""
-    import base64
-    import json
-    
     # 修改头部为none算法
     exploit_header = header.copy()
     exploit_header['alg'] = 'none'
     
     # Base64Url编码
     def base64url_encode(data: dict) -> str:
-        json_str = json.dumps(data, separators=(',', ':'))
-        encoded = base64.urlsafe_b64encode(json_str.encode()).decode()
-        return encoded.rstrip('=')
+        encoded = binascii.b2a_base64(compact_dumps(data), newline=False)
+        return encoded.translate(_B64_TO_URL_TRANS).rstrip(b'=').decode('ascii')
     
     header_b64 = base64url_encode(exploit_header)
     payload_b64 = base64url_encode(payload)
@@ -76,4 +93,4 @@ if __name__ == "__main__":
         status = "❌ 漏洞" if result['vulnerable'] else "✅ 安全"
         print(f"{status} | {description}")
         if result['vulnerable']:
-            print(f"   攻击POC: {result['exploit_poc']}")
\ No newline at end of file
+            print(f"   攻击POC: {generate_exploit_poc(*result['_exploit_poc_args'])}")
\ No newline at end of file
@@ -4,6 +4,11 @@
 常见弱密钥爆破攻击
 """
 
+from typing import Optional
+
+# 检测只读取头部的alg字段，不需要解析载荷
+REQUIRES = frozenset({'alg'})
+
 # 常见弱密钥列表
 WEAK_SECRETS = [
     "secret", "password", "123456", "admin", "token",
@@ -11,41 +16,50 @@ WEAK_SECRETS = [
     "", "null", "none", "undefined", "test"
 ]
 
-def detect(header: dict, payload: dict, signature: str) -> dict:
+# 用于后续爆破时O(1)去重/查找，以及报告中展示的前5个常见弱密钥
+WEAK_SECRETS_SET = frozenset(WEAK_SECRETS)
+WEAK_SECRETS_TOP5 = tuple(WEAK_SECRETS[:5])
+
+# 检测结果只依赖算法类型，预先构建模板，每次返回浅拷贝（调用方修改发现不影响后续审计）
+_HMAC_RESULT = {
+    'vulnerable': False,  # 需要实际爆破才能确定
+    'severity': 'MEDIUM',
+    'detector': 'WeakKey',
+    'description': '使用HMAC算法，建议检查密钥强度',
+    'recommendation': '使用强随机密钥，长度至少32字符',
+    'weak_keys_to_check': WEAK_SECRETS_TOP5,  # 显示前5个常见弱密钥
+    'cvss_score': 7.5
+}
+
+_NON_HMAC_RESULT = {
+    'vulnerable': False,
+    'severity': 'INFO',
+    'detector': 'WeakKey', 
+    'description': '非HMAC算法，弱密钥检测不适用',
+    'cvss_score': 0.0
+}
+
+def detect(header: dict, payload: Optional[dict], signature: str) -> dict:
     """
     通过常见弱密钥列表检测弱密钥
     
     Args:
         header: JWT头部
-        payload: JWT载荷
+        payload: JWT载荷（REQUIRES不含payload时审计器传入None）
         signature: JWT签名（用于验证）
         
     Returns:
         检测结果字典
     """
-    algorithm = header.get('alg', '').upper()
+    algorithm = header.get('alg')
     
     # 只对HMAC算法进行弱密钥检测
-    if algorithm.startswith('HS'):
-        # 这里简化处理，实际应该尝试用每个密钥验证签名
-        # 现在只检查是否有使用弱密钥的迹象
-        return {
-            'vulnerable': False,  # 需要实际爆破才能确定
-            'severity': 'MEDIUM',
-            'detector': 'WeakKey',
-            'description': '使用HMAC算法，建议检查密钥强度',
-            'recommendation': '使用强随机密钥，长度至少32字符',
-            'weak_keys_to_check': WEAK_SECRETS[:5],  # 显示前5个常见弱密钥
-            'cvss_score': 7.5
-        }
+    if not algorithm or algorithm[:2].upper() != 'HS':
+        return dict(_NON_HMAC_RESULT)
     
-    return {
-        'vulnerable': False,
-        'severity': 'INFO',
-        'detector': 'WeakKey', 
-        'description': '非HMAC算法，弱密钥检测不适用',
-        'cvss_score': 0.0
-    }
+    # 这里简化处理，实际应该尝试用每个密钥验证签名
+    # 现在只检查是否有使用弱密钥的迹象
+    return dict(_HMAC_RESULT)
 
 # 占位符，后续可以实现真正的爆破
 def brute_force_weak_keys(jwt_token: str) -> list:
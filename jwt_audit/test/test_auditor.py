@@ -4,6 +4,7 @@ JWT安全审计工具测试套件
 """
 
 import unittest
+from unittest import mock
 import sys
 import os
 import json
@@ -26,7 +27,9 @@ print(f"✅ Python路径: {sys.path}")
 
 # 现在可以安全导入
 try:
-    from auditor import JWTAuditor, decode_jwt
+    from auditor import JWTAuditor, get_auditor, decode_jwt, decode_jwt_header_only, base64url_decode, _dumps
+    from auditor import _dumps_line
+    from auditor import materialize_audit_result
     print("✅ 模块导入成功!")
 except ImportError as e:
     print(f"❌ 导入失败: {e}")
@@ -87,6 +90,64 @@ class TestJWTAuditor(unittest.TestCase):
         critical_vulns = result['summary']['critical_vulnerabilities']
         self.assertGreaterEqual(critical_vulns, 1)
     
+    def test_none_algorithm_poc_serialized(self):
+        """测试延迟生成的POC在输出时被求值，审计结果本身保持可直接序列化"""
+        result = self.auditor.audit(self.none_alg_jwt)
+        
+        json.dumps(result)  # 审计结果中不含不可序列化的对象
+        self.assertTrue(all('exploit_poc' not in f for f in result['findings']))
+        
+        data = json.loads(_dumps(materialize_audit_result(result)))
+        self.assertTrue(all('_exploit_poc_args' not in f for f in data['findings']))
+        pocs = [f['exploit_poc'] for f in data['findings'] if f.get('exploit_poc')]
+        self.assertEqual(len(pocs), 1)
+        
+        header, payload, signature = decode_jwt(pocs[0])
+        self.assertEqual(header['alg'], 'none')
+        self.assertEqual(payload['sub'], '1234567890')
+        self.assertEqual(signature, '')
+    
+    def _make_token(self, header: bytes, payload: bytes, signature: str = '') -> str:
+        """用原始JSON字节构造JWT（不经过json.dumps规范化）"""
+        encode = lambda b: base64.urlsafe_b64encode(b).decode().rstrip('=')
+        return f"{encode(header)}.{encode(payload)}.{signature}"
+    
+    def test_audit_none_algorithm_lenient_payload(self):
+        """测试服务端(标准库json)可接受的宽松载荷不会绕过None算法检测"""
+        token = self._make_token(b'{"alg":"none"}', b'{"sub":"admin","exp":NaN}')
+        result = self.auditor.audit(token)
+        
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertGreaterEqual(result['summary']['critical_vulnerabilities'], 1)
+        json.loads(_dumps(result))  # 报告仍可序列化
+    
+    def test_report_preserves_nan(self):
+        """测试报告如实输出NaN（不因安装的JSON后端不同而变为null）"""
+        token = self._make_token(b'{"alg":"none"}', b'{"sub":"admin","exp":NaN}')
+        result = self.auditor.audit(token)
+        
+        for output in (_dumps(result), _dumps_line(result)):
+            self.assertNotEqual(json.loads(output)['payload']['exp'], None)
+        self.assertIn('"exp":NaN', _dumps_line(result))
+    
+    def test_dumps_line_format_consistent(self):
+        """测试JSON Lines中回退到标准库的行（超过64位的整数）与其它行格式相同"""
+        big = 123456789012345678901234567890
+        self.assertEqual(_dumps_line({'a': [1, 2], 'id': 1}), '{"a":[1,2],"id":1}')
+        self.assertEqual(_dumps_line({'a': [1, 2], 'id': big}), '{"a":[1,2],"id":%d}' % big)
+    
+    def test_decode_preserves_big_integers(self):
+        """测试超过64位的整数在解码和POC中保持原值"""
+        big = 123456789012345678901234567890
+        token = self._make_token(b'{"alg":"none"}', b'{"id":%d}' % big)
+        
+        header, payload, signature = decode_jwt(token)
+        self.assertEqual(payload['id'], big)
+        
+        data = json.loads(_dumps(materialize_audit_result(self.auditor.audit(token))))
+        pocs = [f['exploit_poc'] for f in data['findings'] if f.get('exploit_poc')]
+        self.assertEqual(decode_jwt(pocs[0])[1]['id'], big)
+    
     def test_audit_invalid_token(self):
         """测试无效令牌的审计"""
         result = self.auditor.audit(self.invalid_jwt)
@@ -94,10 +155,67 @@ class TestJWTAuditor(unittest.TestCase):
         self.assertFalse(result['success'])
         self.assertIn('error', result)
     
+    def test_audit_malformed_structure_error(self):
+        """测试结构错误的令牌在审计结果中的错误信息与decode_jwt一致"""
+        for token in ("header.payload", "a.b.c.d", "no-dots"):
+            with self.assertRaises(ValueError) as ctx:
+                decode_jwt(token)
+            
+            result = self.auditor.audit(token)
+            self.assertFalse(result['success'])
+            self.assertEqual(result['error'], str(ctx.exception))
+    
     def test_detectors_loaded(self):
         """测试检测器是否成功加载"""
         self.assertGreater(len(self.auditor.detectors), 0, "没有加载任何检测器")
     
+    def test_plugin_mode_loads_same_detectors(self):
+        """测试插件模式（目录扫描）与静态注册表加载相同的检测器"""
+        with mock.patch.dict(os.environ, {'JWT_AUDIT_PLUGINS': '1'}):
+            plugin_auditor = JWTAuditor()
+        self.assertEqual(plugin_auditor.detectors, self.auditor.detectors)
+    
+    def test_findings_not_shared_between_audits(self):
+        """测试修改一次审计的发现不影响后续审计"""
+        for token in (self.valid_jwt, self.none_alg_jwt):
+            first = self.auditor.audit(token)
+            for finding in first['findings']:
+                finding['severity'] = 'MUTATED'
+            
+            second = self.auditor.audit(token)
+            self.assertTrue(all(f['severity'] != 'MUTATED' for f in second['findings']))
+    
+    def test_get_auditor_singleton(self):
+        """测试get_auditor返回同一个实例"""
+        self.assertIs(get_auditor(), get_auditor())
+        self.assertIsInstance(get_auditor(), JWTAuditor)
+    
+    def test_decode_header_only(self):
+        """测试仅解码头部"""
+        header, signature = decode_jwt_header_only(self.valid_jwt)
+        
+        self.assertEqual(header['alg'], 'HS256')
+        self.assertEqual(signature, self.valid_jwt.rsplit('.', 1)[1])
+        
+        with self.assertRaises(ValueError):
+            decode_jwt_header_only("header.payload")
+    
+    def test_skip_payload_when_not_required(self):
+        """测试所有检测器都不需要载荷时跳过载荷解析"""
+        self.assertTrue(self.auditor._needs_payload)  # None算法检测器需要载荷生成POC
+        
+        from detectors import weak_key
+        with mock.patch('auditor.DETECTORS', (weak_key.detect,)):
+            header_only_auditor = JWTAuditor()
+        self.assertFalse(header_only_auditor._needs_payload)
+        
+        # 载荷部分无效也不影响只依赖头部的审计
+        header_b64 = self.valid_jwt.split('.')[0]
+        result = header_only_auditor.audit(f"{header_b64}.!!!.sig")
+        self.assertTrue(result['success'])
+        self.assertIsNone(result['payload'])
+        self.assertEqual([f['detector'] for f in result['findings']], ['WeakKey'])
+    
     def test_jwt_structure_validation(self):
         """测试JWT结构验证"""
         # 测试部分不足的JWT
@@ -133,6 +251,12 @@ class TestJWTEncoding(unittest.TestCase):
         
         self.assertEqual(json.loads(decoded), test_data)
 
+    def test_base64url_decode_helper(self):
+        """测试base64url_decode处理URL安全字符和缺失填充"""
+        for raw in (b'\xfb\xff\xbf', b'\xfb\xff', b'\xfb', b'{"a":1}'):
+            encoded = base64.urlsafe_b64encode(raw).decode().rstrip('=')
+            self.assertEqual(base64url_decode(encoded), raw)
+
 def run_all_tests():
     """运行所有测试并生成报告"""
     print("🧪 开始JWT安全审计工具测试")
@@ -0,0 +1,68 @@
+"""
+JWT安全审计工具启动脚本测试
+"""
+
+import unittest
+import sys
+import os
+from unittest import mock
+
+# ========== 修复导入路径 ==========
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+import run
+
+INSTALLED = {'unittest': 'unittest'}
+MISSING = {'not-installed': 'jwt_audit_not_installed_module'}
+
+class TestCheckDependencies(unittest.TestCase):
+    """依赖检查及环境变量标记测试"""
+
+    def setUp(self):
+        # 每个测试使用干净的环境变量，结束后恢复
+        patcher = mock.patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop('JWT_AUDIT_DEPS_OK', None)
+        os.environ.pop('JWT_AUDIT_FORCE_RECHECK', None)
+
+    def test_distribution_mapped_to_import_name(self):
+        """测试按导入名检查依赖（pyjwt的导入名为jwt）"""
+        self.assertEqual(run.REQUIRED_PACKAGES['pyjwt'], 'jwt')
+
+    def test_marker_set_after_passing_check(self):
+        """测试检查通过后记录当前解释器"""
+        with mock.patch.object(run, 'REQUIRED_PACKAGES', INSTALLED):
+            self.assertTrue(run.check_dependencies())
+        self.assertEqual(os.environ['JWT_AUDIT_DEPS_OK'], sys.executable)
+
+    def test_marker_not_set_after_failing_check(self):
+        """测试缺少依赖时不记录标记"""
+        with mock.patch.object(run, 'REQUIRED_PACKAGES', MISSING):
+            self.assertFalse(run.check_dependencies())
+        self.assertNotIn('JWT_AUDIT_DEPS_OK', os.environ)
+
+    def test_marker_honoured(self):
+        """测试已有标记时跳过重复检查"""
+        with mock.patch.object(run, 'REQUIRED_PACKAGES', INSTALLED):
+            run.check_dependencies()
+        with mock.patch.object(run, 'REQUIRED_PACKAGES', MISSING):
+            self.assertTrue(run.check_dependencies())
+
+    def test_marker_ignored_for_other_interpreter(self):
+        """测试其它解释器留下的标记不生效"""
+        os.environ['JWT_AUDIT_DEPS_OK'] = sys.executable + '-other'
+        with mock.patch.object(run, 'REQUIRED_PACKAGES', MISSING):
+            self.assertFalse(run.check_dependencies())
+
+    def test_force_recheck_bypasses_marker(self):
+        """测试JWT_AUDIT_FORCE_RECHECK=1时忽略标记重新检查"""
+        os.environ['JWT_AUDIT_DEPS_OK'] = sys.executable
+        os.environ['JWT_AUDIT_FORCE_RECHECK'] = '1'
+        with mock.patch.object(run, 'REQUIRED_PACKAGES', MISSING):
+            self.assertFalse(run.check_dependencies())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,45 @@
 # setup.py
-from setuptools import setup, find_packages
+from setuptools import setup, find_namespace_packages
+
+# 可选：构建环境中安装了Cython时将审计热路径编译为C扩展（与.py同目录的.so优先被导入），
+# 未安装Cython或编译失败（如缺少C编译器）时保持纯Python。
+# pip默认在隔离环境中构建，需先安装Cython再执行：pip install --no-build-isolation .
+# jwt_audit目录没有__init__.py，需显式指定与实际包路径一致的模块名
+cmdclass = {}
+
+try:
+    from Cython.Build import cythonize
+    from setuptools import Extension
+    from setuptools.command.build_ext import build_ext
+    from setuptools.errors import CCompilerError, ExecError, PlatformError
+
+    class optional_build_ext(build_ext):
+        """编译失败时跳过扩展模块，安装纯Python版本"""
+
+        def run(self):
+            try:
+                super().run()
+            except PlatformError as e:
+                self.warn(f"跳过C扩展编译，使用纯Python实现: {e}")
+
+        def build_extension(self, ext):
+            try:
+                super().build_extension(ext)
+            except (CCompilerError, ExecError, PlatformError, OSError) as e:
+                self.warn(f"跳过C扩展 {ext.name}，使用纯Python实现: {e}")
+
+    cmdclass["build_ext"] = optional_build_ext
+
+    ext_modules = cythonize(
+        [
+            Extension("jwt_audit.src.auditor", ["jwt_audit/src/auditor.py"]),
+            Extension("jwt_audit.src.detectors.none_algorithm", ["jwt_audit/src/detectors/none_algorithm.py"]),
+            Extension("jwt_audit.src.detectors.weak_key", ["jwt_audit/src/detectors/weak_key.py"]),
+        ],
+        compiler_directives={"language_level": 3},
+    )
+except ImportError:
+    ext_modules = []
 
 with open("README.md", "r", encoding="utf-8") as fh:
     long_description = fh.read()
@@ -12,8 +52,11 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/sunday512/JWT",
-    packages=find_packages(where="src"),
-    package_dir={"": "src"},
+    # jwt_audit目录没有__init__.py，按命名空间包收集，保证与扩展模块名一致
+    packages=find_namespace_packages(include=["jwt_audit", "jwt_audit.src", "jwt_audit.src.*"],
+                                     exclude=["*.__pycache__"]),
+    ext_modules=ext_modules,
+    cmdclass=cmdclass,
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
@@ -33,9 +76,13 @@ setup(
         "click>=8.0",
         "rich>=10.0",
     ],
+    extras_require={
+        "fast": ["orjson>=3.6"],  # 可选：更快的JSON解析/序列化
+        "fast-lite": ["ujson>=5.5"],  # 可选：orjson不可用时的轻量替代
+    },
     entry_points={
         "console_scripts": [
-            "jwt-audit=jwt_audit.cli:cli",  # 关键：创建命令行命令
+            "jwt-audit=jwt_audit.src.cli:cli",  # 关键：创建命令行命令
         ],
     },
 )
\ No newline at end of file